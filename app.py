@@ -1,122 +1,459 @@
+# Heavy third-party modules are imported inside the functions that use them,
+# so pages that never touch OCR, MongoDB or Mistral don't pay for them
 import streamlit as st
-import pytesseract
 from PIL import Image
-from pymongo import MongoClient
+from collections import OrderedDict
 from datetime import datetime
-import requests
+from io import BytesIO
+import asyncio
+import glob
+import hashlib
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
-# Load environment variables
-load_dotenv()
+@st.cache_resource(show_spinner=False)
+def load_environment():
+    """Load environment variables from .env once per process instead of on every rerun"""
+    load_dotenv()
 
-# Configure Tesseract path - needs to be modified for cloud deployment
-if os.path.exists('/app/.apt/usr/bin/tesseract'):
-    # Path for Streamlit Cloud
-    pytesseract.pytesseract.tesseract_cmd = '/app/.apt/usr/bin/tesseract'
-else:
-    # Local Windows path
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# Load environment variables
+load_environment()
 
 # MongoDB Configuration - use environment variable for cloud deployment
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = "medical_prescriptions"
 COLLECTION_NAME = "extracted_texts"
+# Maximum number of stored prescriptions loaded at once
+PRESCRIPTION_FETCH_LIMIT = 50
+# Bounds on the prescription context sent to Mistral for "All Prescriptions"
+CHAT_PRESCRIPTION_LIMIT = 20
+CHAT_PRESCRIPTION_MAX_CHARS = 2000
+
+# Longest image side fed to Tesseract; larger uploads are downscaled before OCR
+OCR_MAX_DIMENSION = 2000
 
 # Mistral API Configuration
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
+# The endpoint might vary based on Mistral's API documentation
+MISTRAL_API_URL = "https://api.mistral.ai/v1/chat/completions"
+# Maximum number of concurrent Mistral requests when querying all prescriptions
+MISTRAL_MAX_CONCURRENCY = 5
+# Attempts per Mistral request when it times out, is rate limited or hits a server error
+MISTRAL_RETRY_ATTEMPTS = 4
+# Completed answers are reused for identical questions on identical prescription data
+MISTRAL_CACHE_TTL = 3600
+MISTRAL_CACHE_MAX_ENTRIES = 256
+
+@st.cache_resource(show_spinner=False)
+def get_mongo_client():
+    """Create a single pooled MongoDB client shared across reruns and sessions"""
+    from pymongo import MongoClient
+    
+    client = MongoClient(MONGO_URI, maxPoolSize=10, minPoolSize=2, serverSelectionTimeoutMS=2000)
+    # Test the connection once by pinging the server; failures raise and are not cached
+    client.admin.command('ping')
+    # Back the newest-first listing with an index; this is a no-op if it already exists
+    client[DB_NAME][COLLECTION_NAME].create_index([("upload_date", -1)])
+    return client
 
 def get_db_connection():
     """Establish connection to MongoDB"""
+    from pymongo import WriteConcern
+    
     try:
-        client = MongoClient(MONGO_URI)
+        client = get_mongo_client()
         db = client[DB_NAME]
-        collection = db[COLLECTION_NAME]
-        # Test the connection by pinging the server
-        client.admin.command('ping')
-        st.success("Database connection successful!")
+        # Saves only need the primary's acknowledgement, not a journal flush
+        collection = db[COLLECTION_NAME].with_options(write_concern=WriteConcern(w=1, j=False))
+        # Only announce the connection once per session instead of on every rerun
+        if not st.session_state.get("db_connected"):
+            st.session_state.db_connected = True
+            st.success("Database connection successful!")
         return collection
     except Exception as e:
         st.warning(f"Database connection error: {e}. Some features will be limited.")
         return None
 
-def extract_text_from_image(image):
+def get_tessdata_path():
+    """Locate the Tesseract language data - needs to be modified for cloud deployment"""
+    # An explicit TESSDATA_PREFIX always wins
+    if os.getenv("TESSDATA_PREFIX"):
+        return os.getenv("TESSDATA_PREFIX")
+    # The tesserocr wheel ships no language data, so look where apt installs it;
+    # the version directory varies by distribution (4.00, 5, ...), prefer the newest
+    for pattern in ['/app/.apt/usr/share/tesseract-ocr/*/tessdata',  # Streamlit Cloud
+                    '/usr/share/tesseract-ocr/*/tessdata']:  # Debian / Ubuntu
+        matches = sorted(glob.glob(pattern))
+        if matches:
+            return matches[-1]
+    if os.path.exists(r'C:\Program Files\Tesseract-OCR\tessdata'):
+        # Local Windows path
+        return r'C:\Program Files\Tesseract-OCR\tessdata'
+    # Use the default tessdata location tesserocr was built against
+    return None
+
+@st.cache_resource(show_spinner=False)
+def get_tesseract_api():
+    """Load the Tesseract engine once and keep the model resident across reruns"""
+    from tesserocr import PyTessBaseAPI, PSM, OEM
+    
+    # Probed here so the filesystem checks run once, when the engine is first loaded
+    tessdata_path = get_tessdata_path()
+    kwargs = {"path": tessdata_path} if tessdata_path else {}
+    # A prescription is a single block of text, so skip orientation and column detection
+    api = PyTessBaseAPI(lang='eng', psm=PSM.SINGLE_BLOCK, oem=OEM.LSTM_ONLY, **kwargs)
+    # preprocess_image normalizes to dark text on a light background, so skip the inverted-text pass
+    api.SetVariable("tessedit_do_invert", "0")
+    # The API object is not thread-safe and Streamlit serves sessions from multiple threads
+    return api, threading.Lock()
+
+def preprocess_image(image):
+    """Normalize lighting and binarize the image so Tesseract gets clean text"""
+    import cv2
+    import numpy as np
+    
+    image = image.convert('L')
+    # Phone photos are far larger than Tesseract needs and OCR cost grows with pixel count
+    if max(image.size) > OCR_MAX_DIMENSION:
+        image.thumbnail((OCR_MAX_DIMENSION, OCR_MAX_DIMENSION), Image.LANCZOS)
+    arr = np.array(image)
+    # Even out non-uniform lighting common in phone photos of prescriptions
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    arr = clahe.apply(arr)
+    # Otsu picks the binarization threshold from the image histogram
+    _, arr = cv2.threshold(arr, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Thresholding keeps the input's polarity; text covers less area than background,
+    # so a mostly dark result means light text on a dark background - flip it
+    if arr.mean() < 127:
+        arr = cv2.bitwise_not(arr)
+    return arr
+
+def decode_image(image_bytes):
+    """Decode uploaded image bytes once into an RGB array shared by display and OCR"""
+    import numpy as np
+    
+    return np.asarray(Image.open(BytesIO(image_bytes)).convert('RGB'))
+
+@st.cache_data(show_spinner=False)
+def run_ocr(image_bytes, _image=None):
+    """Run Tesseract OCR on raw image bytes; cached by content so reruns skip OCR"""
+    # Reuse the already decoded array when given; only the bytes form the cache key
+    image = Image.fromarray(_image) if _image is not None else Image.open(BytesIO(image_bytes))
+    # tesserocr only accepts PIL images, so wrap the preprocessed array back up
+    image = Image.fromarray(preprocess_image(image))
+    api, lock = get_tesseract_api()
+    with lock:
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+def extract_text_from_image(image_bytes, image=None):
     """Extract text from image using Tesseract OCR"""
     try:
-        text = pytesseract.image_to_string(image)
+        text = run_ocr(image_bytes, image)
         return text.strip() if text else "No text detected"
     except Exception as e:
         st.error(f"Error extracting text: {e}")
         return None
 
-def save_to_database(extracted_text, collection):
-    """Save extracted text to MongoDB"""
+def extract_text_from_images(images):
+    """Extract text from several (bytes, decoded array) images, reusing the resident Tesseract engine"""
+    return [extract_text_from_image(image_bytes, image) for image_bytes, image in images]
+
+def save_to_database(extracted_texts, collection):
+    """Save extracted texts to MongoDB in a single round-trip"""
+    from pymongo.errors import BulkWriteError
+    
     try:
-        prescription_data = {
+        prescriptions_data = [{
             "extracted_text": extracted_text,
             "upload_date": datetime.now()
-        }
-        result = collection.insert_one(prescription_data)
-        st.write(f"Insert operation result: {result.inserted_id}")  # Debug output
-        return result.inserted_id
+        } for extracted_text in extracted_texts]
+        result = collection.insert_many(prescriptions_data, ordered=False)
+        # Invalidate cached prescription listings so the new documents show up
+        bump_prescriptions_revision()
+        return result.inserted_ids
+    except BulkWriteError as e:
+        # An unordered insert keeps going past failed documents, so some may have been saved
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        inserted_ids = [prescription["_id"] for idx, prescription in enumerate(prescriptions_data)
+                        if idx not in failed and "_id" in prescription]
+        if e.details.get("nInserted", 0) > 0:
+            bump_prescriptions_revision()
+        st.warning(f"Saved {e.details.get('nInserted', 0)} of {len(prescriptions_data)} prescriptions; "
+                   f"{len(failed)} failed: {e.details['writeErrors'][0]['errmsg'] if failed else e}")
+        return inserted_ids or None
     except Exception as e:
         st.error(f"Error saving to database: {str(e)}")
         return None
 
-def fetch_stored_prescriptions(collection):
-    """Fetch all stored prescriptions from MongoDB"""
+@st.cache_resource(show_spinner=False)
+def get_prescriptions_revision():
+    """Shared revision counter for stored prescriptions, bumped on every insert"""
+    return {"value": 0}, threading.Lock()
+
+def bump_prescriptions_revision():
+    """Invalidate cached prescription listings for every session"""
+    revision, lock = get_prescriptions_revision()
+    with lock:
+        revision["value"] += 1
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_prescriptions(_collection, include_text, revision):
+    """Load the newest prescriptions with only the fields the UI needs; cached per revision"""
+    projection = {"upload_date": 1, "extracted_text": 1} if include_text else {"upload_date": 1}
+    return list(_collection.find({}, projection).sort("upload_date", -1).limit(PRESCRIPTION_FETCH_LIMIT))
+
+@st.cache_data(ttl=60, max_entries=PRESCRIPTION_FETCH_LIMIT, show_spinner=False)
+def load_prescription_text(_collection, prescription_id):
+    """Load the extracted text of a single prescription"""
+    from bson import ObjectId
+    
+    document = _collection.find_one({"_id": ObjectId(prescription_id)}, {"extracted_text": 1})
+    return document["extracted_text"] if document else ""
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_prescription_texts(_collection, revision):
+    """Collect the newest prescription texts server-side, truncated to bound the prompt size"""
+    pipeline = [
+        {"$sort": {"upload_date": -1}},
+        {"$limit": CHAT_PRESCRIPTION_LIMIT},
+        {"$project": {"extracted_text": {"$substrCP": ["$extracted_text", 0, CHAT_PRESCRIPTION_MAX_CHARS]}}},
+        {"$group": {"_id": None, "texts": {"$push": "$extracted_text"}}}
+    ]
+    result = list(_collection.aggregate(pipeline))
+    return result[0]["texts"] if result else []
+
+def fetch_stored_prescriptions(collection, include_text=True):
+    """Fetch stored prescriptions from MongoDB, newest first"""
+    try:
+        revision, _ = get_prescriptions_revision()
+        return load_prescriptions(collection, include_text, revision["value"])
+    except Exception as e:
+        st.error(f"Error fetching prescriptions: {e}")
+        return []
+
+def fetch_prescription_texts(collection):
+    """Fetch the texts of the newest prescriptions for querying them all at once"""
     try:
-        return list(collection.find().sort("upload_date", -1))
+        revision, _ = get_prescriptions_revision()
+        return load_prescription_texts(collection, revision["value"])
     except Exception as e:
         st.error(f"Error fetching prescriptions: {e}")
         return []
 
+def fetch_prescription_text(collection, prescription_id):
+    """Fetch the extracted text of the selected prescription only"""
+    try:
+        return load_prescription_text(collection, str(prescription_id))
+    except Exception as e:
+        st.error(f"Error fetching prescription: {e}")
+        return ""
+
+@st.cache_resource(show_spinner=False)
+def get_mistral_session():
+    """Create a keep-alive HTTP session so chat turns reuse the TLS connection"""
+    import requests
+    
+    session = requests.Session()
+    session.headers.update({
+        "Authorization": f"Bearer {MISTRAL_API_KEY}",
+        "Content-Type": "application/json"
+    })
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("https://", adapter)
+    return session
+
+def build_mistral_payload(prompt, prescription_data=None, stream=False):
+    """Build the chat completion request body for the user's prompt and prescription data"""
+    # Prepare context with prescription data if available
+    context = ""
+    system_message = ""
+    
+    if prescription_data:
+        context = f"\nPrescription data: {prescription_data}"
+        system_message = f"You are a medical assistant that helps analyze prescription data. Answer questions based on the following prescription data:{context}"
+    else:
+        system_message = "You are a helpful medical assistant that can answer general medical questions. Note that you are not a replacement for professional medical advice."
+    
+    return {
+        "model": "mistral-large-latest",  # Use appropriate model name
+        "messages": [
+            {"role": "system", "content": system_message}, 
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 500,
+        "stream": stream
+    }
+
+@st.cache_resource(show_spinner=False)
+def get_mistral_response_cache():
+    """Shared cache of completed Mistral answers, oldest first for eviction"""
+    return OrderedDict(), threading.Lock()
+
+def mistral_cache_key(prompt, prescription_data=None):
+    """Key answers on the prompt and a short digest of the prescription data"""
+    ctx_hash = hashlib.blake2b((prescription_data or "").encode(), digest_size=16).hexdigest()
+    return prompt, ctx_hash
+
+def get_cached_mistral_response(key):
+    """Return a cached answer that has not expired, or None"""
+    cache, lock = get_mistral_response_cache()
+    with lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        created, response = entry
+        if time.time() - created > MISTRAL_CACHE_TTL:
+            del cache[key]
+            return None
+        return response
+
+def cache_mistral_response(key, response):
+    """Store a completed answer, evicting the oldest ones beyond the size limit"""
+    cache, lock = get_mistral_response_cache()
+    with lock:
+        cache[key] = (time.time(), response)
+        cache.move_to_end(key)
+        while len(cache) > MISTRAL_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+def is_transient_status(status):
+    """Rate limits and server errors are worth retrying; other client errors are not"""
+    return status == 429 or status >= 500
+
+def is_transient_request_error(exception):
+    """Decide whether a failed requests call to Mistral should be retried"""
+    import requests
+    
+    if isinstance(exception, (requests.Timeout, requests.ConnectionError)):
+        return True
+    if isinstance(exception, requests.HTTPError) and exception.response is not None:
+        return is_transient_status(exception.response.status_code)
+    return False
+
+def is_transient_aiohttp_error(exception):
+    """Decide whether a failed aiohttp call to Mistral should be retried"""
+    import aiohttp
+    
+    if isinstance(exception, (asyncio.TimeoutError, aiohttp.ClientConnectionError)):
+        return True
+    if isinstance(exception, aiohttp.ClientResponseError):
+        return is_transient_status(exception.status)
+    return False
+
+@retry(stop=stop_after_attempt(MISTRAL_RETRY_ATTEMPTS), wait=wait_exponential(multiplier=1, min=1, max=8),
+       retry=retry_if_exception(is_transient_request_error), reraise=True)
+def open_mistral_stream(payload):
+    """Start a streamed completion, retrying transient failures before any token is shown"""
+    response = get_mistral_session().post(MISTRAL_API_URL, json=payload, timeout=(3.05, 30), stream=True)
+    try:
+        response.raise_for_status()
+    except Exception:
+        # Release the pooled connection before retrying or giving up
+        response.close()
+        raise
+    return response
+
+@retry(stop=stop_after_attempt(MISTRAL_RETRY_ATTEMPTS), wait=wait_exponential(multiplier=1, min=1, max=8),
+       retry=retry_if_exception(is_transient_aiohttp_error), reraise=True)
+async def post_mistral_async(http_session, semaphore, payload):
+    """Send a single completion request, retrying transient failures outside the semaphore"""
+    async with semaphore:
+        async with http_session.post(MISTRAL_API_URL, json=payload) as response:
+            response.raise_for_status()
+            return await response.json()
+
 def query_mistral_api(prompt, prescription_data=None):
-    """Query the Mistral API with the user's prompt and prescription data"""
+    """Query the Mistral API and yield the response text as it streams in"""
     try:
         if not MISTRAL_API_KEY:
-            return "Error: Mistral API key not found. Please set it in the .env file."
-            
-        # Prepare context with prescription data if available
-        context = ""
-        system_message = ""
-        
-        if prescription_data:
-            context = f"\nPrescription data: {prescription_data}"
-            system_message = f"You are a medical assistant that helps analyze prescription data. Answer questions based on the following prescription data:{context}"
-        else:
-            system_message = "You are a helpful medical assistant that can answer general medical questions. Note that you are not a replacement for professional medical advice."
-            
-        # Prepare the API request
-        headers = {
-            "Authorization": f"Bearer {MISTRAL_API_KEY}",
-            "Content-Type": "application/json"
-        }
+            yield "Error: Mistral API key not found. Please set it in the .env file."
+            return
         
-        # The endpoint might vary based on Mistral's API documentation
-        url = "https://api.mistral.ai/v1/chat/completions"
+        key = mistral_cache_key(prompt, prescription_data)
+        cached_response = get_cached_mistral_response(key)
+        if cached_response is not None:
+            yield cached_response
+            return
         
-        payload = {
-            "model": "mistral-large-latest",  # Use appropriate model name
-            "messages": [
-                {"role": "system", "content": system_message}, 
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 500
-        }
+        payload = build_mistral_payload(prompt, prescription_data, stream=True)
+        chunks = []
+        completed = False
         
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+        with open_mistral_stream(payload) as response:
+            # Tokens arrive as server-sent events: "data: {...}" lines ending with "data: [DONE]"
+            for line in response.iter_lines():
+                line = line.decode("utf-8")
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data == "[DONE]":
+                    completed = True
+                    break
+                chunk = json.loads(data)
+                content = chunk["choices"][0]["delta"].get("content")
+                if content:
+                    chunks.append(content)
+                    yield content
         
-        # Extract the response text based on Mistral API response format
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
+        # Only cache answers that streamed to completion; a dropped connection just ends iter_lines
+        if completed and chunks:
+            cache_mistral_response(key, "".join(chunks))
         
+    except Exception as e:
+        yield f"Error querying Mistral API: {str(e)}"
+
+async def query_mistral_api_async(http_session, semaphore, prompt, prescription_data):
+    """Query the Mistral API for a single prescription without blocking the other requests"""
+    key = mistral_cache_key(prompt, prescription_data)
+    cached_response = get_cached_mistral_response(key)
+    if cached_response is not None:
+        return cached_response
+    
+    payload = build_mistral_payload(prompt, prescription_data)
+    result = await post_mistral_async(http_session, semaphore, payload)
+    answer = result["choices"][0]["message"]["content"]
+    if answer:
+        cache_mistral_response(key, answer)
+    return answer
+
+async def gather_mistral_answers(prompt, prescriptions):
+    """Send one request per prescription concurrently, bounded by the rate-limit semaphore"""
+    import aiohttp
+    
+    semaphore = asyncio.Semaphore(MISTRAL_MAX_CONCURRENCY)
+    headers = {
+        "Authorization": f"Bearer {MISTRAL_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(headers=headers, timeout=timeout) as http_session:
+        return await asyncio.gather(
+            *[query_mistral_api_async(http_session, semaphore, prompt, prescription) for prescription in prescriptions],
+            return_exceptions=True
+        )
+
+def query_all_prescriptions(prompt, prescriptions):
+    """Ask the same question about each prescription in parallel and merge the answers"""
+    if not MISTRAL_API_KEY:
+        return "Error: Mistral API key not found. Please set it in the .env file."
+    
+    try:
+        answers = asyncio.run(gather_mistral_answers(prompt, prescriptions))
     except Exception as e:
         return f"Error querying Mistral API: {str(e)}"
+    
+    # Report failures per prescription so one bad request doesn't hide the other answers
+    return "\n\n".join([f"**Prescription {idx + 1}:**\n{answer}" if not isinstance(answer, Exception)
+                        else f"**Prescription {idx + 1}:**\nError querying Mistral API: {str(answer)}"
+                        for idx, answer in enumerate(answers)])
 
-def display_chat_interface(prescription_data=None):
+def display_chat_interface(prescription_data=None, prescription_list=None):
     """Display a chat interface for querying prescription data"""
     # Different title based on whether prescription data is provided
     if prescription_data:
@@ -128,10 +465,20 @@ def display_chat_interface(prescription_data=None):
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
     
+    chat_fragment(prescription_data, prescription_list)
+
+@st.fragment
+def chat_fragment(prescription_data=None, prescription_list=None):
+    """Render the chat history and input; sending a message reruns only this fragment"""
+    # The fragment renders inside a container, so the chat input is placed inline rather than
+    # pinned to the bottom; reserve the history area above it so new messages land there
+    history = st.container()
+    
     # Display chat history
-    for message in st.session_state.chat_history:
-        with st.chat_message(message["role"]):
-            st.write(message["content"])
+    with history:
+        for message in st.session_state.chat_history:
+            with st.chat_message(message["role"]):
+                st.write(message["content"])
     
     # Chat input - different placeholder based on context
     placeholder = "Ask about your prescription..." if prescription_data else "Ask any medical question..."
@@ -141,25 +488,29 @@ def display_chat_interface(prescription_data=None):
         # Add user message to chat history
         st.session_state.chat_history.append({"role": "user", "content": user_query})
         
-        # Display user message
-        with st.chat_message("user"):
-            st.write(user_query)
-        
-        # Get response from Mistral API
-        with st.spinner("Thinking..."):
-            response = query_mistral_api(user_query, prescription_data)
+        with history:
+            # Display user message
+            with st.chat_message("user"):
+                st.write(user_query)
+            
+            with st.chat_message("assistant"):
+                if prescription_list:
+                    # Query each prescription separately in parallel instead of one giant prompt
+                    with st.spinner("Thinking..."):
+                        response = query_all_prescriptions(user_query, prescription_list)
+                    st.write(response)
+                else:
+                    # Display assistant response as it streams in from Mistral API
+                    response = st.write_stream(query_mistral_api(user_query, prescription_data))
         
         # Add assistant response to chat history
         st.session_state.chat_history.append({"role": "assistant", "content": response})
-        
-        # Display assistant response
-        with st.chat_message("assistant"):
-            st.write(response)
             
-    # Add a button to clear chat history
-    if st.session_state.chat_history and st.button("Clear Chat History", key="clear_chat_history_button"):
-        st.session_state.chat_history = []
-        st.rerun()
+    # Add a button to clear chat history; the callback runs before the rerun, so it works
+    # whether the click is handled in a full-script run or a fragment rerun
+    if st.session_state.chat_history:
+        st.button("Clear Chat History", key="clear_chat_history_button",
+                  on_click=st.session_state.chat_history.clear)
 
 def main():
     st.title("Medical Prescription Analyzer")
@@ -191,20 +542,36 @@ def main():
     
     if page == "Extract Text":
         # File uploader
-        uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "png", "jpeg"])
+        uploaded_files = st.file_uploader("Choose images...", type=["jpg", "png", "jpeg"], accept_multiple_files=True)
         
-        if uploaded_file is not None:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Uploaded Prescription", use_column_width=True)
+        if uploaded_files:
+            # Decode each upload once and reuse the array for both display and OCR
+            images = []
+            for uploaded_file in uploaded_files:
+                image_bytes = uploaded_file.getvalue()
+                image = decode_image(image_bytes)
+                images.append((image_bytes, image))
+                st.image(image, caption=f"Uploaded Prescription - {uploaded_file.name}", use_column_width=True)
             
             # Extract Text Button
             if st.button("Extract Text"):
-                with st.spinner("Processing image..."):
-                    extracted_text = extract_text_from_image(image)
+                with st.spinner("Processing images..."):
+                    texts = extract_text_from_images(images)
+                    # Keep only the files that produced text, along with their names
+                    results = [(uploaded_file.name, text) for uploaded_file, text in zip(uploaded_files, texts) if text]
+                    extracted_texts = [text for _, text in results]
                     
-                    if extracted_text:
+                    if extracted_texts:
                         st.subheader("Extracted Text")
-                        st.text_area("Result", extracted_text, height=300, key="extracted_text_area")
+                        for idx, (file_name, text) in enumerate(results):
+                            st.text_area(f"Result - {file_name}", text, height=300, key=f"extracted_text_area_{idx}")
+                        
+                        # Chat uses a single prescription as-is, or all of them in the "All Prescriptions" format
+                        if len(extracted_texts) == 1:
+                            extracted_text = extracted_texts[0]
+                        else:
+                            extracted_text = "\n\n".join([f"Prescription {idx + 1}:\n{text}" 
+                                                      for idx, text in enumerate(extracted_texts)])
                         
                         # Database operations
                         if collection is not None:
@@ -213,9 +580,9 @@ def main():
                             with col1:
                                 if st.button("Submit to Database", key="submit_to_db_button"):
                                     with st.spinner("Saving to database..."):
-                                        result_id = save_to_database(extracted_text, collection)
-                                        if result_id:
-                                            st.success(f"Successfully saved! Document ID: {result_id}")
+                                        result_ids = save_to_database(extracted_texts, collection)
+                                        if result_ids:
+                                            st.success(f"Successfully saved {len(result_ids)} of {len(extracted_texts)} prescription(s)!")
                                         else:
                                             st.error("Failed to save to database. Check MongoDB status.")
                             
@@ -225,6 +592,8 @@ def main():
                                         prescriptions = fetch_stored_prescriptions(collection)
                                         if prescriptions:
                                             st.subheader("Stored Prescriptions")
+                                            if len(prescriptions) == PRESCRIPTION_FETCH_LIMIT:
+                                                st.caption(f"Showing the newest {PRESCRIPTION_FETCH_LIMIT} prescriptions.")
                                             for idx, prescription in enumerate(prescriptions):
                                                 st.write(f"Prescription {idx + 1} - {prescription['upload_date']}")
                                                 st.text_area(f"Text {idx + 1}", 
@@ -262,11 +631,12 @@ def main():
         
         # Initialize prescription data
         prescription_data = ""
+        prescription_list = None
         
         # If database is connected, offer database options
         if collection is not None:
-            # Get all prescriptions
-            prescriptions = fetch_stored_prescriptions(collection)
+            # Get the prescription list without their text; text is loaded only for the selection
+            prescriptions = fetch_stored_prescriptions(collection, include_text=False)
             
             if prescriptions:
                 # Create options for the selectbox
@@ -279,17 +649,29 @@ def main():
                     prescription_options.insert(0, "Current Extracted Prescription")
                 
                 selected_option = st.selectbox("Choose prescription data to query", prescription_options)
+                if len(prescriptions) == PRESCRIPTION_FETCH_LIMIT:
+                    st.caption(f"Only the newest {PRESCRIPTION_FETCH_LIMIT} prescriptions are listed.")
                 
                 # Prepare prescription data based on selection
                 if selected_option == "All Prescriptions":
-                    prescription_data = "\n\n".join([f"Prescription {idx + 1}:\n{prescription['extracted_text']}" 
-                                              for idx, prescription in enumerate(prescriptions)])
+                    prescription_list = fetch_prescription_texts(collection)
+                    if not prescription_list:
+                        st.warning("Could not load the stored prescriptions. Please try again or use Direct Chat.")
+                        return
+                    # The chat context is bounded more tightly than the list above, so say so
+                    st.caption(f"Using the newest {len(prescription_list)} of {len(prescriptions)} listed prescriptions, "
+                               f"each truncated to {CHAT_PRESCRIPTION_MAX_CHARS} characters.")
+                    prescription_data = "\n\n".join([f"Prescription {idx + 1}:\n{text}" 
+                                              for idx, text in enumerate(prescription_list)])
                 elif selected_option == "Current Extracted Prescription":
                     prescription_data = st.session_state.current_prescription
                 else:
                     # Extract index from the option string
                     idx = int(selected_option.split(" ")[1]) - 1
-                    prescription_data = prescriptions[idx]["extracted_text"]
+                    prescription_data = fetch_prescription_text(collection, prescriptions[idx]["_id"])
+                    if not prescription_data:
+                        st.warning("Could not load the selected prescription. Please try again or use Direct Chat.")
+                        return
             elif has_current_prescription:
                 # If no prescriptions in database but we have current prescription
                 st.info("Using current extracted prescription data.")
@@ -310,7 +692,7 @@ def main():
             st.text_area("Prescription Data", prescription_data, height=200)
         
         # Display chat interface
-        display_chat_interface(prescription_data)
+        display_chat_interface(prescription_data, prescription_list)
         
     elif page == "Direct Chat":
         st.subheader("Direct Chat with Medical Assistant")